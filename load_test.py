@@ -0,0 +1,428 @@
+"""Concurrent-session load test for src.py using Streamlit's headless AppTest.
+
+Each simulated session is its own AppTest running the full script (CSS/base64
+injection, widget rebuild, generation, PNG encode and history write). The
+image providers are replaced by an in-process mock, so no network calls are
+made and no API keys are used.
+
+AppTest swaps process-global runtime state on every run, so sessions cannot
+run concurrently in one process. Two modes work around that:
+
+- default: one worker process per session, all running at once. Sessions do
+  not contend for the GIL as they would inside a single Streamlit server, so
+  gen/s scales with CPU cores and is an upper bound, not a node capacity.
+- --single-process: N sessions in one process, driven serially and
+  interleaved one rerun at a time. This is the GIL-bound cost a single server
+  process pays; "round" is the time for every session to complete one rerun,
+  roughly what each user waits when all N act at once.
+
+Usage:
+    python load_test.py --sessions 1,2,4,8 --iterations 5
+    python load_test.py --sessions 1,2,4,8 --single-process
+    python load_test.py --sessions 8 --max-p95-ms 1500   # fail on regressions
+
+AppTest runs scripts without a server, so the numbers cover script rerun cost
+on one node, not the websocket/server layer in front of it.
+"""
+import argparse
+import io
+import multiprocessing
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from unittest import mock
+from urllib.parse import parse_qs, urlparse
+
+from PIL import Image
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+APP_DIR = Path(__file__).resolve().parent
+APP_FILE = APP_DIR / "src.py"
+GENERATE_LABEL = "Generate Professional Image"
+
+PROMPTS = [
+    "a lighthouse on a cliff at sunset, cinematic lighting",
+    "a cozy reading nook with plants, professional photography",
+    "futuristic city skyline at night, highly detailed",
+    "portrait of a red fox in the snow, award-winning",
+]
+
+# --- Mock providers (installed in every process that runs sessions) ---
+_provider_latency_s = 0.0
+_png_cache = {}
+
+def _mock_png(width, height):
+    """Return PNG bytes of the requested size, encoded once per size."""
+    key = (width, height)
+    if key not in _png_cache:
+        buf = io.BytesIO()
+        Image.new("RGB", key, (139, 92, 246)).save(buf, format="PNG")
+        _png_cache[key] = buf.getvalue()
+    return _png_cache[key]
+
+class _MockResponse:
+    """Minimal stand-in for requests.Response."""
+    def __init__(self, content):
+        self.status_code = 200
+        self.headers = {"content-type": "image/png"}
+        self.content = content
+
+def _mock_post(url, *args, **kwargs):
+    """Mock ClipDrop: always returns a 1024x1024 PNG."""
+    time.sleep(_provider_latency_s)
+    return _MockResponse(_mock_png(1024, 1024))
+
+def _mock_get(url, *args, **kwargs):
+    """Mock Pollinations: returns a PNG of the size in the query string."""
+    time.sleep(_provider_latency_s)
+    query = parse_qs(urlparse(url).query)
+    width = int(query.get("width", ["1024"])[0])
+    height = int(query.get("height", ["1024"])[0])
+    return _MockResponse(_mock_png(width, height))
+
+def _init_worker(latency_ms, history_dir):
+    """Install mocks and point the app at a scratch history store (also the pool initializer)."""
+    global _provider_latency_s
+    _provider_latency_s = latency_ms / 1000
+    # src.py resolves config and images relative to the working directory
+    os.chdir(APP_DIR)
+    os.environ["ARTIFY_HISTORY_DIR"] = history_dir
+    mock.patch("requests.post", _mock_post).start()
+    mock.patch("requests.get", _mock_get).start()
+
+# --- Measurement helpers ---
+def _rss_mb():
+    """Current RSS of this process in MB (peak RSS if psutil is unavailable)."""
+    if psutil is not None:
+        return psutil.Process().memory_info().rss / 2**20
+    if resource is not None:
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reports KB, macOS reports bytes
+        return maxrss / 2**20 if sys.platform == "darwin" else maxrss / 1024
+    return None
+
+def _sample_threads(stop, peak):
+    """Record the peak number of live threads (excluding this sampler) until `stop` is set."""
+    while not stop.is_set():
+        peak[0] = max(peak[0], threading.active_count() - 1)
+        time.sleep(0.01)
+
+def _percentile(values, pct):
+    """Nearest-rank percentile, or None for an empty list."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+# --- Session simulation ---
+def _timed_run(run):
+    """Call a rerun trigger (``at.run`` or ``widget.run``) and return latency in ms."""
+    start = time.perf_counter()
+    run()
+    return (time.perf_counter() - start) * 1000
+
+def _check_tree(at):
+    """Raise if the last run errored or did not render the input widgets."""
+    if at.exception:
+        raise RuntimeError(f"script exception: {at.exception[0].message}")
+    if not at.text_area or len(at.selectbox) < 2:
+        raise RuntimeError("empty element tree")
+
+def _find_generate_button(at):
+    """Return the main generate button of an AppTest."""
+    for button in at.button:
+        if button.label == GENERATE_LABEL:
+            return button
+    raise RuntimeError("Generate button not found")
+
+def _new_result():
+    """Empty per-session metrics record."""
+    return {
+        "cold_ms": None, "widget_ms": [], "generate_ms": [],
+        "generations": 0, "failures": 0, "errors": [],
+        "start": None, "warm_start": None, "end": None,
+        "rss_end_mb": None, "peak_threads": 0,
+    }
+
+def _session_steps(session_id, iterations, timeout, result):
+    """Drive one user, yielding after every rerun so sessions can be interleaved.
+
+    The first yield comes right after the cold start. Each iteration changes
+    the prompt, size and quality, then clicks generate. Errors are recorded
+    in `result` as failures instead of being raised.
+    """
+    from streamlit.testing.v1 import AppTest
+
+    try:
+        at = AppTest.from_file(str(APP_FILE), default_timeout=timeout)
+        result["cold_ms"] = _timed_run(at.run)
+        _check_tree(at)
+    except Exception as e:
+        result["failures"] = iterations
+        result["errors"].append(f"session {session_id} cold start: {e!r}")
+        return
+    yield
+
+    sizes = at.selectbox[0].options
+    qualities = at.selectbox[1].options
+    for i in range(iterations):
+        step = session_id + i
+        try:
+            result["widget_ms"].append(
+                _timed_run(at.text_area[0].input(PROMPTS[step % len(PROMPTS)]).run)
+            )
+            _check_tree(at)
+            yield
+            result["widget_ms"].append(
+                _timed_run(at.selectbox[0].select(sizes[step % len(sizes)]).run)
+            )
+            _check_tree(at)
+            yield
+            result["widget_ms"].append(
+                _timed_run(at.selectbox[1].select(qualities[step % len(qualities)]).run)
+            )
+            _check_tree(at)
+            yield
+
+            result["generate_ms"].append(_timed_run(_find_generate_button(at).click().run))
+            _check_tree(at)
+            if any(e.value.startswith("❌") for e in at.error):
+                raise RuntimeError("generation reported an error")
+            result["generations"] += 1
+        except Exception as e:
+            result["failures"] += 1
+            result["errors"].append(f"session {session_id} iteration {i}: {e!r}")
+        yield
+
+def run_session(session_id, iterations, timeout, barrier):
+    """Worker-process entry point: run one session to completion."""
+    result = _new_result()
+    stop = threading.Event()
+    peak_threads = [0]
+    sampler = threading.Thread(target=_sample_threads, args=(stop, peak_threads), daemon=True)
+
+    try:
+        barrier.wait(timeout)
+    except threading.BrokenBarrierError:
+        pass  # a sibling worker died before starting; run unsynchronised
+    sampler.start()
+    result["start"] = time.time()
+    try:
+        steps = _session_steps(session_id, iterations, timeout, result)
+        if next(steps, StopIteration) is not StopIteration:
+            result["warm_start"] = time.time()
+            for _ in steps:
+                pass
+        result["rss_end_mb"] = _rss_mb()
+        return result
+    finally:
+        result["end"] = time.time()
+        stop.set()
+        sampler.join()
+        result["peak_threads"] = peak_threads[0]
+
+def _summarize(sessions, results, wall_s):
+    """Latency, throughput and failure figures shared by both modes."""
+    cold_ms = [r["cold_ms"] for r in results if r.get("cold_ms") is not None]
+    widget_ms = [ms for r in results for ms in r.get("widget_ms", [])]
+    generate_ms = [ms for r in results for ms in r.get("generate_ms", [])]
+    generations = sum(r.get("generations", 0) for r in results)
+    return {
+        "sessions": sessions,
+        "cold_p50": statistics.median(cold_ms) if cold_ms else None,
+        "widget_p50": statistics.median(widget_ms) if widget_ms else None,
+        "widget_p95": _percentile(widget_ms, 95),
+        "generate_p50": statistics.median(generate_ms) if generate_ms else None,
+        "generate_p95": _percentile(generate_ms, 95),
+        "round_p50": None,
+        "throughput": generations / wall_s if wall_s else 0.0,
+        "failures": sum(r["failures"] for r in results),
+        "errors": [e for r in results for e in r["errors"]],
+    }
+
+def run_step(sessions, iterations, timeout, latency_ms, history_dir):
+    """Run `sessions` concurrent sessions, one worker process each, and return one report row."""
+    ctx = multiprocessing.get_context("spawn")
+    with multiprocessing.Manager() as manager:
+        barrier = manager.Barrier(sessions)
+        with ProcessPoolExecutor(
+            max_workers=sessions, mp_context=ctx,
+            initializer=_init_worker, initargs=(latency_ms, history_dir),
+        ) as pool:
+            futures = [
+                pool.submit(run_session, i, iterations, timeout, barrier)
+                for i in range(sessions)
+            ]
+            results = []
+            for future in futures:
+                try:
+                    results.append(future.result())
+                except Exception:
+                    results.append({"failures": iterations, "errors": [traceback.format_exc(limit=1)]})
+
+    # Throughput covers warm reruns only; cold starts are reported separately
+    warm = [r for r in results if r.get("warm_start") is not None]
+    wall_s = (
+        max(r["end"] for r in warm) - min(r["warm_start"] for r in warm)
+        if warm else 0
+    )
+    row = _summarize(sessions, results, wall_s)
+    rss = [r["rss_end_mb"] for r in results if r.get("rss_end_mb") is not None]
+    row["rss_mb"] = sum(rss) if rss else None
+    row["threads"] = sum(r.get("peak_threads", 0) for r in results)
+    return row
+
+def run_step_single(sessions, iterations, timeout):
+    """Run `sessions` sessions in this process, interleaved one rerun at a time."""
+    results = [_new_result() for _ in range(sessions)]
+    stop = threading.Event()
+    peak_threads = [0]
+    sampler = threading.Thread(target=_sample_threads, args=(stop, peak_threads), daemon=True)
+    sampler.start()
+    try:
+        # First round is every session's cold start
+        active = []
+        for i, result in enumerate(results):
+            steps = _session_steps(i, iterations, timeout, result)
+            if next(steps, StopIteration) is not StopIteration:
+                active.append(steps)
+
+        warm_start = time.perf_counter()
+        round_ms = []
+        while active:
+            round_start = time.perf_counter()
+            for steps in list(active):
+                if next(steps, StopIteration) is StopIteration:
+                    active.remove(steps)
+            if active:
+                round_ms.append((time.perf_counter() - round_start) * 1000)
+        wall_s = time.perf_counter() - warm_start
+    finally:
+        stop.set()
+        sampler.join()
+
+    row = _summarize(sessions, results, wall_s)
+    row["round_p50"] = statistics.median(round_ms) if round_ms else None
+    row["rss_mb"] = _rss_mb()
+    row["threads"] = peak_threads[0]
+    return row
+
+def _fmt(value, spec, suffix=""):
+    """Format a metric, or '-' when it could not be measured."""
+    return "-" if value is None else f"{value:{spec}}{suffix}"
+
+def _add_deltas(rows):
+    """Add the change in node RSS and threads from the previous step to each row."""
+    previous = None
+    for row in rows:
+        row["rss_delta_mb"] = row["threads_delta"] = None
+        if previous is not None:
+            if row["rss_mb"] is not None and previous["rss_mb"] is not None:
+                row["rss_delta_mb"] = row["rss_mb"] - previous["rss_mb"]
+            row["threads_delta"] = row["threads"] - previous["threads"]
+        previous = row
+
+def print_report(rows, single_process):
+    """Print the capacity table, then any session errors."""
+    _add_deltas(rows)
+    columns = [
+        ("sessions", "sessions", "d", ""),
+        ("cold p50", "cold_p50", ".0f", "ms"),
+        ("rerun p50", "widget_p50", ".0f", "ms"),
+        ("rerun p95", "widget_p95", ".0f", "ms"),
+        ("gen p50", "generate_p50", ".0f", "ms"),
+        ("gen p95", "generate_p95", ".0f", "ms"),
+    ]
+    if single_process:
+        columns.append(("round p50", "round_p50", ".0f", "ms"))
+    columns += [
+        ("gen/s", "throughput", ".2f", ""),
+        ("fail", "failures", "d", ""),
+        ("node RSS", "rss_mb", ".1f", "MB"),
+        ("ΔRSS", "rss_delta_mb", "+.1f", "MB"),
+        ("threads", "threads", "d", ""),
+        ("Δthreads", "threads_delta", "+d", ""),
+    ]
+    header = " ".join(f"{title:>10}" for title, _, _, _ in columns)
+    print(header)
+    print("-" * len(header))
+    for r in rows:
+        print(" ".join(f"{_fmt(r[key], spec, suffix):>10}" for _, key, spec, suffix in columns))
+
+    if single_process:
+        print("\nSingle process: sessions are interleaved one rerun at a time and share the GIL. "
+              "node RSS and threads are this process's; round is the time for every "
+              "session to complete one rerun.")
+    else:
+        print("\nOne process per session: sessions do not contend for the GIL, so gen/s is an "
+              "upper bound, not a node capacity. node RSS and threads are summed across "
+              "all worker processes; use --single-process for GIL-bound numbers.")
+    print("ΔRSS and Δthreads are the change from the previous step.")
+
+    for r in rows:
+        for error in r["errors"]:
+            print(f"[{r['sessions']} sessions] {error.strip()}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Concurrent-session load test for ARTIFY")
+    parser.add_argument("--sessions", default="1,2,4,8",
+                        help="comma-separated session counts to step through")
+    parser.add_argument("--iterations", type=int, default=3,
+                        help="generate clicks per session")
+    parser.add_argument("--provider-latency-ms", type=float, default=0,
+                        help="simulated provider response time")
+    parser.add_argument("--timeout", type=float, default=120,
+                        help="AppTest script run timeout in seconds")
+    parser.add_argument("--single-process", action="store_true",
+                        help="interleave all sessions in this process to measure GIL-bound cost")
+    parser.add_argument("--max-p95-ms", type=float, default=None,
+                        help="exit non-zero if any warm rerun p95 exceeds this")
+    args = parser.parse_args(argv)
+    session_counts = [int(n) for n in args.sessions.split(",") if n.strip()]
+
+    rows = []
+    with tempfile.TemporaryDirectory(prefix="artify-loadtest-") as history_dir:
+        if args.single_process:
+            _init_worker(args.provider_latency_ms, history_dir)
+        for sessions in session_counts:
+            if args.single_process:
+                rows.append(run_step_single(sessions, args.iterations, args.timeout))
+            else:
+                rows.append(run_step(
+                    sessions, args.iterations, args.timeout,
+                    args.provider_latency_ms, history_dir
+                ))
+
+    print_report(rows, args.single_process)
+
+    if args.max_p95_ms is not None:
+        worst = max(
+            (v for r in rows for v in (r["widget_p95"], r["generate_p95"]) if v is not None),
+            default=0
+        )
+        if worst > args.max_p95_ms:
+            print(f"FAIL: rerun p95 {worst:.0f}ms exceeds {args.max_p95_ms:.0f}ms")
+            return 1
+    if any(r["failures"] for r in rows):
+        print("FAIL: some generations did not complete")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,4 +1,5 @@
 import streamlit as st
+import streamlit.components.v1 as components
 import requests
 import io
 from PIL import Image, ImageFilter, ImageEnhance
@@ -7,6 +8,11 @@ import os
 from pathlib import Path
 from urllib.parse import quote
 import base64
+import hashlib
+import sqlite3
+import tempfile
+import time
+import uuid
 import toml
 
 # Ignore all warnings
@@ -50,6 +56,138 @@ CLIPDROP_API_KEY_2 = _get_secret("CLIPDROP_API_KEY_2")  # Add second key
 # Create list of ClipDrop API keys
 CLIPDROP_KEYS = [key for key in [CLIPDROP_API_KEY, CLIPDROP_API_KEY_2] if key]
 
+# --- Generation history store ---
+# SQLite index plus a content-addressed blob directory (blobs/<sha[:2]>/<sha>.png).
+HISTORY_DIR = Path(os.getenv("ARTIFY_HISTORY_DIR", "history"))
+HISTORY_DB = HISTORY_DIR / "index.sqlite"
+HISTORY_BLOBS = HISTORY_DIR / "blobs"
+HISTORY_PAGE_SIZE = 8
+THUMBNAIL_SIZE = (256, 256)
+HISTORY_OWNER_COOKIE = "artify_history_owner"
+HISTORY_OWNER_MAX_AGE = 365 * 24 * 60 * 60
+
+def _history_connect():
+    """Open a connection to the history index."""
+    conn = sqlite3.connect(HISTORY_DB, timeout=10)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+@st.cache_resource
+def init_history_store():
+    """Create the history directory and index schema once per process."""
+    HISTORY_BLOBS.mkdir(parents=True, exist_ok=True)
+    conn = _history_connect()
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS generations (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                owner TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                prompt TEXT NOT NULL,
+                width INTEGER NOT NULL,
+                height INTEGER NOT NULL,
+                quality TEXT NOT NULL,
+                seed INTEGER,
+                provider TEXT NOT NULL,
+                generation_ms REAL NOT NULL,
+                encode_ms REAL NOT NULL,
+                blob_sha256 TEXT NOT NULL,
+                thumbnail BLOB NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_generations_owner ON generations (owner, id)")
+        conn.commit()
+    finally:
+        conn.close()
+    return True
+
+def _blob_path(sha256):
+    """Return the on-disk path for a content-addressed blob."""
+    return HISTORY_BLOBS / sha256[:2] / f"{sha256}.png"
+
+def make_thumbnail(image):
+    """Encode a small JPEG thumbnail for the history gallery."""
+    thumb = image.convert("RGB")
+    thumb.thumbnail(THUMBNAIL_SIZE, Image.Resampling.LANCZOS)
+    buf = io.BytesIO()
+    thumb.save(buf, format="JPEG", quality=80)
+    return buf.getvalue()
+
+def save_generation(owner, png_bytes, thumbnail, prompt, width, height, quality, seed, provider, generation_ms, encode_ms):
+    """Store the PNG blob (deduplicated by hash) and index the generation for `owner`."""
+    sha256 = hashlib.sha256(png_bytes).hexdigest()
+    path = _blob_path(sha256)
+    if not path.exists():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Unique temp file per writer; sessions are threads sharing one process
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(png_bytes)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    conn = _history_connect()
+    try:
+        cur = conn.execute(
+            """INSERT INTO generations
+               (owner, created_at, prompt, width, height, quality, seed, provider,
+                generation_ms, encode_ms, blob_sha256, thumbnail)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+            (owner, time.time(), prompt, width, height, quality, seed, provider,
+             generation_ms, encode_ms, sha256, thumbnail)
+        )
+        conn.commit()
+        return cur.lastrowid
+    finally:
+        conn.close()
+
+def count_generations(owner):
+    """Return the number of generations indexed for `owner`."""
+    conn = _history_connect()
+    try:
+        return conn.execute(
+            "SELECT COUNT(*) FROM generations WHERE owner = ?", (owner,)
+        ).fetchone()[0]
+    finally:
+        conn.close()
+
+def list_generations(owner, page, page_size=HISTORY_PAGE_SIZE):
+    """Return one page of `owner`'s history rows, newest first, with thumbnails only."""
+    conn = _history_connect()
+    try:
+        return conn.execute(
+            """SELECT id, created_at, prompt, width, height, quality, seed, provider,
+                      generation_ms, encode_ms, blob_sha256, thumbnail
+               FROM generations WHERE owner = ?
+               ORDER BY id DESC LIMIT ? OFFSET ?""",
+            (owner, page_size, page * page_size)
+        ).fetchall()
+    finally:
+        conn.close()
+
+def get_generation(owner, generation_id):
+    """Return a single history row, or None if it does not exist or belongs to someone else."""
+    conn = _history_connect()
+    try:
+        return conn.execute(
+            """SELECT id, created_at, prompt, width, height, quality, seed, provider,
+                      generation_ms, encode_ms, blob_sha256
+               FROM generations WHERE id = ? AND owner = ?""",
+            (generation_id, owner)
+        ).fetchone()
+    finally:
+        conn.close()
+
+def load_blob(sha256):
+    """Read a full-resolution PNG blob from disk."""
+    with open(_blob_path(sha256), "rb") as f:
+        return f.read()
+
 # Configure Streamlit page
 st.set_page_config(
     page_title="ARTIFY",
@@ -355,9 +493,14 @@ def simple_watermark_removal_v2(image):
 
 # Main image generation function
 def generate_clean_image(prompt, width, height, quality_level):
-    """Generate clean, professional image using ClipDrop API with Pollinations fallback."""
+    """Generate clean, professional image using ClipDrop API with Pollinations fallback.
+
+    Returns a ``(image, provider, seed)`` tuple; ``image`` is None on failure.
+    """
     
     final_image = None
+    provider = None
+    seed = hash(prompt) % 1000
     
     # Try ClipDrop first (usually no watermarks)
     if CLIPDROP_KEYS:
@@ -387,7 +530,7 @@ def generate_clean_image(prompt, width, height, quality_level):
                     if final_image.size != (width, height):
                         final_image = final_image.resize((width, height), Image.Resampling.LANCZOS)
                     
-                    return final_image
+                    return final_image, "ClipDrop", None
                     
                 elif response.status_code == 401:
                     continue  # Try next key
@@ -408,13 +551,15 @@ def generate_clean_image(prompt, width, height, quality_level):
     fallback_apis = [
         {
             "name": "Pollinations (Enhanced)",
-            "url": f"https://image.pollinations.ai/prompt/{quote(prompt)}?width={width}&height={height}&seed={hash(prompt) % 1000}&enhance=true&nologo=true",
-            "timeout": 60
+            "url": f"https://image.pollinations.ai/prompt/{quote(prompt)}?width={width}&height={height}&seed={seed}&enhance=true&nologo=true",
+            "timeout": 60,
+            "seed": seed
         },
         {
             "name": "Pollinations (Standard)",
             "url": f"https://image.pollinations.ai/prompt/{quote(prompt)}?width={width}&height={height}",
-            "timeout": 45
+            "timeout": 45,
+            "seed": None
         }
     ]
     
@@ -429,6 +574,8 @@ def generate_clean_image(prompt, width, height, quality_level):
             
             if response.status_code == 200 and response.headers.get('content-type', '').startswith('image'):
                 final_image = Image.open(io.BytesIO(response.content))
+                provider = api["name"]
+                seed = api["seed"]
                 st.success(f"✅ Image generated!")
                 break
             else:
@@ -441,7 +588,7 @@ def generate_clean_image(prompt, width, height, quality_level):
     
     if not final_image:
         st.error("❌ image generation failed.")
-        return None
+        return None, None, None
     
     # Apply enhancement/watermark removal based on source
     try:
@@ -463,7 +610,7 @@ def generate_clean_image(prompt, width, height, quality_level):
     except Exception as e:
         st.warning(f"Processing failed: {e}")
     
-    return final_image
+    return final_image, provider, seed
 
 # Title and subtitle
 st.markdown(
@@ -544,6 +691,31 @@ with col2:
 # Store the current image in session state
 if 'current_image' not in st.session_state:
     st.session_state.current_image = None
+if 'history_page' not in st.session_state:
+    st.session_state.history_page = 0
+if 'history_open' not in st.session_state:
+    st.session_state.history_open = None
+
+# Per-browser history owner, kept in a cookie so it stays out of shareable URLs.
+# The cookie is set from the browser (Streamlit cannot set cookies server-side), so it
+# is readable by page scripts and is only as private as the browser profile holding it.
+if 'history_owner' not in st.session_state:
+    owner = st.context.cookies.get(HISTORY_OWNER_COOKIE, "")
+    if len(owner) != 32 or not all(c in "0123456789abcdef" for c in owner):
+        owner = uuid.uuid4().hex
+        components.html(
+            f"<script>document.cookie = '{HISTORY_OWNER_COOKIE}={owner}; "
+            f"max-age={HISTORY_OWNER_MAX_AGE}; path=/; SameSite=Strict';</script>",
+            height=0
+        )
+    st.session_state.history_owner = owner
+
+# Make sure the history index exists before it is written or paged
+try:
+    history_enabled = init_history_store()
+except Exception as e:
+    st.warning(f"Generation history unavailable: {e}")
+    history_enabled = False
 
 # Generation logic
 if generate_btn:
@@ -577,7 +749,9 @@ if generate_btn:
                     status_text.text("Your image is getting ready 🖌️")
                 
                 # Generate clean image
-                final_image = generate_clean_image(prompt, width, height, quality)
+                generation_start = time.perf_counter()
+                final_image, provider, seed = generate_clean_image(prompt, width, height, quality)
+                generation_ms = (time.perf_counter() - generation_start) * 1000
                 
                 if final_image:
                     progress_bar.progress(70)
@@ -592,6 +766,24 @@ if generate_btn:
                     # Store image in session state
                     st.session_state.current_image = final_image
                     
+                    # Encode once; the same bytes feed the history store and the download button
+                    encode_start = time.perf_counter()
+                    buf = io.BytesIO()
+                    final_image.save(buf, format="PNG")
+                    png_bytes = buf.getvalue()
+                    thumbnail = make_thumbnail(final_image)
+                    encode_ms = (time.perf_counter() - encode_start) * 1000
+                    
+                    if history_enabled:
+                        try:
+                            save_generation(
+                                st.session_state.history_owner, png_bytes, thumbnail,
+                                prompt, width, height, quality,
+                                seed, provider, generation_ms, encode_ms
+                            )
+                        except Exception as e:
+                            st.warning(f"Could not save to history: {e}")
+                    
                     progress_bar.progress(100)
                     status_text.text("✅ Complete!")
                     
@@ -608,11 +800,9 @@ if generate_btn:
                     
                     # Add download button for the clean image
                     with col2:
-                        buf = io.BytesIO()
-                        final_image.save(buf, format="PNG")
                         st.download_button(
                             label="⬇️ Download High-Quality Image",
-                            data=buf.getvalue(),
+                            data=png_bytes,
                             file_name="ai_generated_professional.png",
                             mime="image/png",
                             use_container_width=True
@@ -631,6 +821,83 @@ if generate_btn:
                 st.error(f"❌ An unexpected error occurred: {str(e)}")
                 st.info("💡 Try refreshing the page or using a simpler prompt.")
 
+# History gallery: pages through thumbnails in the index, full-resolution blobs load on open
+if history_enabled:
+    st.markdown("---")
+    st.markdown("### 🕘 Generation History")
+    
+    try:
+        total = count_generations(st.session_state.history_owner)
+        
+        if total == 0:
+            st.info("Your generated images will appear here.")
+        else:
+            page_count = (total + HISTORY_PAGE_SIZE - 1) // HISTORY_PAGE_SIZE
+            st.session_state.history_page = min(st.session_state.history_page, page_count - 1)
+            
+            nav_prev, nav_info, nav_next = st.columns([1, 2, 1])
+            with nav_prev:
+                if st.button("◀ Newer", key="history_prev", disabled=st.session_state.history_page == 0):
+                    st.session_state.history_page -= 1
+                    st.session_state.history_open = None
+                    st.rerun()
+            with nav_info:
+                st.markdown(
+                    f"<p style='text-align:center; color:white;'>Page {st.session_state.history_page + 1} of {page_count} ({total} images)</p>",
+                    unsafe_allow_html=True
+                )
+            with nav_next:
+                if st.button("Older ▶", key="history_next", disabled=st.session_state.history_page >= page_count - 1):
+                    st.session_state.history_page += 1
+                    st.session_state.history_open = None
+                    st.rerun()
+            
+            rows = list_generations(st.session_state.history_owner, st.session_state.history_page)
+            gallery_cols = st.columns(4)
+            for i, row in enumerate(rows):
+                with gallery_cols[i % 4]:
+                    st.image(row["thumbnail"], caption=row["prompt"][:60], use_container_width=True)
+                    if st.button("Open", key=f"history_open_{row['id']}", use_container_width=True):
+                        st.session_state.history_open = row["id"]
+            
+            # Full-resolution view: one disk read, no regeneration
+            if st.session_state.history_open is not None:
+                entry = get_generation(st.session_state.history_owner, st.session_state.history_open)
+                if entry is None:
+                    st.session_state.history_open = None
+                else:
+                    try:
+                        png_bytes = load_blob(entry["blob_sha256"])
+                    except FileNotFoundError:
+                        png_bytes = None
+                        st.error("❌ The stored image file is missing.")
+                    
+                    if png_bytes is not None:
+                        seed_text = entry["seed"] if entry["seed"] is not None else "n/a"
+                        st.image(
+                            png_bytes,
+                            caption=f"{entry['prompt']} — {entry['width']}x{entry['height']}, {entry['quality']}",
+                            use_container_width=True
+                        )
+                        st.caption(
+                            f"Provider: {entry['provider']} · Seed: {seed_text} · "
+                            f"Generation: {entry['generation_ms']:.0f} ms · Encode: {entry['encode_ms']:.0f} ms"
+                        )
+                        st.download_button(
+                            label="⬇️ Download Image",
+                            data=png_bytes,
+                            file_name=f"artify_{entry['blob_sha256'][:12]}.png",
+                            mime="image/png",
+                            key="history_download",
+                            use_container_width=True
+                        )
+                    if st.button("Close", key="history_close", use_container_width=True):
+                        st.session_state.history_open = None
+                        st.rerun()
+    
+    except (sqlite3.Error, OSError) as e:
+        st.warning(f"Could not read history: {e}")
+
 # Tips section
 st.markdown("---")
 st.markdown("### 💡 Pro Tips for Better Results")